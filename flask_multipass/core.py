@@ -39,6 +39,7 @@ class Multipass:
         self.identity_callback = None
         self.login_check_callback = None
         self.provider_registry = {AuthProvider: {}, IdentityProvider: {}}
+        self._default_state = None
         if app is not None:
             self.init_app(app)
 
@@ -54,6 +55,8 @@ class Multipass:
         if 'multipass' in app.extensions:
             raise RuntimeError('Flask application already initialized')
         state = app.extensions['multipass'] = _MultipassState(self, app)
+        if self._default_state is None:
+            self._default_state = state
         # TODO: write docs for the config (see flask-cache for a pretty example)
         app.config.setdefault('MULTIPASS_AUTH_PROVIDERS', {})
         app.config.setdefault('MULTIPASS_IDENTITY_PROVIDERS', {})
@@ -71,14 +74,36 @@ class Multipass:
         with app.app_context():
             self._create_login_rule()
             state.auth_providers = ImmutableDict(self._create_providers('AUTH', AuthProvider))
+            if len(state.auth_providers) == 1:
+                state.single_auth_provider = next(iter(state.auth_providers.values()))
             state.identity_providers = ImmutableDict(self._create_providers('IDENTITY', IdentityProvider))
-            state.provider_map = ImmutableDict(get_canonical_provider_map(current_app.config['MULTIPASS_PROVIDER_MAP']))
-            validate_provider_map(state)
+            state.searchable_identity_providers = tuple(p for p in state.identity_providers.values()
+                                                        if p.supports_search)
+            state.group_identity_providers = tuple(p for p in state.identity_providers.values() if p.supports_groups)
+            provider_map = current_app.config['MULTIPASS_PROVIDER_MAP']
+            if not provider_map and not state.auth_providers:
+                # nothing to link or validate, e.g. in tests or CLI tools
+                state.provider_map = state.resolved_provider_map = ImmutableDict()
+            else:
+                state.provider_map = ImmutableDict(get_canonical_provider_map(provider_map))
+                validate_provider_map(state)
+                state.resolved_provider_map = ImmutableDict(self._resolve_provider_map(state))
+
+    def _get_state(self):
+        """Returns the multipass state of the current application.
+
+        This avoids the extension lookup in the common case of the
+        extension only being used with a single application.
+        """
+        state = self._default_state
+        if state is not None and state.app is current_app._get_current_object():
+            return state
+        return get_state()
 
     @property
     def auth_providers(self):
         """Returns a read-only dict of the active auth providers"""
-        return get_state().auth_providers
+        return self._get_state().auth_providers
 
     @property
     def single_auth_provider(self):
@@ -86,17 +111,17 @@ class Multipass:
 
         This returns ``None`` if there are multiple auth providers.
         """
-        return next(iter(self.auth_providers.values())) if len(self.auth_providers) == 1 else None
+        return self._get_state().single_auth_provider
 
     @property
     def identity_providers(self):
         """Returns a read-only dict of the active identity providers"""
-        return get_state().identity_providers
+        return self._get_state().identity_providers
 
     @property
     def provider_map(self):
         """Returns a read-only mapping between auth and identity providers."""
-        return get_state().provider_map
+        return self._get_state().provider_map
 
     def register_provider(self, cls, type_):
         """Registers a new provider type.
@@ -215,28 +240,31 @@ class Multipass:
                           unique identity.
         :return: A Flask response
         """
-        links = self.provider_map[auth_info.provider.name]
-        identities = []
-        for link in links:
-            provider = self.identity_providers[link['identity_provider']]
-            mapping = link.get('mapping', {})
-            identity_info = provider.get_identity_from_auth(auth_info.map(mapping))
-            if identity_info is None:
-                continue
-            if identity_info.secure_login is None:
+        all_matching = current_app.config['MULTIPASS_ALL_MATCHING_IDENTITIES']
+        require_identity = current_app.config['MULTIPASS_REQUIRE_IDENTITY']
+        links = self._get_state().resolved_provider_map[auth_info.provider.name]
+        if all_matching:
+            identity_infos = [identity_info for identity_info in self._get_identities_from_auth(links, auth_info)
+                              if identity_info is not None]
+        else:
+            identity_info = None
+            for provider, mapping in links:
+                identity_info = provider.get_identity_from_auth(auth_info.map(mapping))
+                if identity_info is not None:
+                    break
+            identity_infos = (identity_info,) if identity_info is not None else ()
+        if not identity_infos and require_identity:
+            raise IdentityRetrievalFailed("No identity found", provider=auth_info.provider)
+        for identity in identity_infos:
+            if identity.secure_login is None:
                 # if no information about login security has been set by the identity
                 # provider, copy whatever the auth provider may have
-                identity_info.secure_login = auth_info.secure_login
-            identities.append(identity_info)
-            if not current_app.config['MULTIPASS_ALL_MATCHING_IDENTITIES']:
-                break
-        if not identities and current_app.config['MULTIPASS_REQUIRE_IDENTITY']:
-            raise IdentityRetrievalFailed("No identity found", provider=auth_info.provider)
+                identity.secure_login = auth_info.secure_login
         session['_multipass_login_provider'] = auth_info.provider.name
-        if current_app.config['MULTIPASS_ALL_MATCHING_IDENTITIES']:
-            response = self.login_finished(identities)
+        if all_matching:
+            response = self.login_finished(identity_infos)
         else:
-            response = self.login_finished(identities[0] if identities else None)
+            response = self.login_finished(identity_info)
         return response or self.redirect_success()
 
     def handle_auth_error(self, exc, redirect_to_login=False):
@@ -263,7 +291,7 @@ class Multipass:
         template = current_app.config[key]
         if template is None:
             raise RuntimeError('Config option missing: ' + key)
-        return render_template(template, **kwargs)
+        return render_template(self._get_template(template), **kwargs)
 
     def identity_handler(self, callback):
         """
@@ -355,10 +383,9 @@ class Multipass:
             if any(not x for x in v):
                 raise ValueError('Empty search criterion: ' + k)
 
-        for provider in self.identity_providers.values():
-            if providers is not None and provider.name not in providers:
-                continue
-            if not provider.supports_search:
+        provider_filter = frozenset(providers) if providers is not None else None
+        for provider in self._get_state().searchable_identity_providers:
+            if provider_filter is not None and provider.name not in provider_filter:
                 continue
             yield from provider.search_identities(provider.map_search_criteria(criteria), exact=exact)
 
@@ -383,10 +410,9 @@ class Multipass:
 
         found_identities = []
         total = 0
-        for provider in self.identity_providers.values():
-            if providers is not None and provider.name not in providers:
-                continue
-            if not provider.supports_search:
+        provider_filter = frozenset(providers) if providers is not None else None
+        for provider in self._get_state().searchable_identity_providers:
+            if provider_filter is not None and provider.name not in provider_filter:
                 continue
             if provider.supports_search_ex:
                 result, subtotal = provider.search_identities_ex(provider.map_search_criteria(criteria), exact=exact,
@@ -429,10 +455,9 @@ class Multipass:
                       substring matches are performed.
         :return: An iterable of matching groups.
         """
-        for provider in self.identity_providers.values():
-            if providers is not None and provider.name not in providers:
-                continue
-            if not provider.supports_groups:
+        provider_filter = frozenset(providers) if providers is not None else None
+        for provider in self._get_state().group_identity_providers:
+            if provider_filter is not None and provider.name not in provider_filter:
                 continue
             yield from provider.search_groups(name, exact=exact)
 
@@ -446,6 +471,25 @@ class Multipass:
         group = self.get_group(provider, group_name)
         return identity_identifier in group
 
+    def _get_template(self, name):
+        """Returns the compiled template with the given name.
+
+        The template object is cached per application unless Jinja is
+        configured to auto-reload templates, in which case the name is
+        returned so Flask performs the usual lookup.
+
+        :param name: The name of the template.
+        """
+        jinja_env = current_app.jinja_env
+        if jinja_env.auto_reload:
+            return name
+        cache = self._get_state().template_cache
+        try:
+            return cache[name]
+        except KeyError:
+            cache[name] = template = jinja_env.get_template(name)
+            return template
+
     def _create_providers(self, key, base):
         """Instantiates all providers
 
@@ -457,14 +501,47 @@ class Multipass:
         providers = {}
         provider_classes = set()
         for name, settings in current_app.config[f'MULTIPASS_{key}_PROVIDERS'].items():
-            settings = settings.copy()
-            cls = resolve_provider_type(base, settings.pop('type'), registry)
+            cls = resolve_provider_type(base, settings['type'], registry)
             if not cls.multi_instance and cls in provider_classes:
                 raise RuntimeError('Provider does not support multiple instances: ' + cls.__name__)
-            providers[name] = cls(self, name, settings)
+            providers[name] = cls(self, name, {k: v for k, v in settings.items() if k != 'type'})
             provider_classes.add(cls)
         return providers
 
+    def _resolve_provider_map(self, state):
+        """Resolves the identity providers linked to each auth provider
+
+        :param state: The :class:`._MultipassState` instance with an
+                      already validated provider map.
+        :return: A dict mapping auth provider names to tuples of
+                 ``(identity_provider, mapping)`` pairs.
+        """
+        return {auth_provider_name: tuple((state.identity_providers[link['identity_provider']], link.get('mapping', {}))
+                                          for link in links)
+                for auth_provider_name, links in state.provider_map.items()}
+
+    def _get_identities_from_auth(self, links, auth_info):
+        """Retrieves the identities for all links of an auth provider
+
+        Links pointing to the same identity provider are looked up
+        together using :meth:`.IdentityProvider.get_identities_from_auth`.
+
+        :param links: A tuple of ``(identity_provider, mapping)`` pairs.
+        :param auth_info: An :class:`.AuthInfo` instance.
+        :return: A list containing an :class:`.IdentityInfo` or ``None``
+                 for each link, in the order of `links`.
+        """
+        batches = {}
+        for i, (provider, mapping) in enumerate(links):
+            batches.setdefault(provider, []).append((i, auth_info.map(mapping)))
+        identity_infos = [None] * len(links)
+        for provider, batch in batches.items():
+            indexes = [i for i, _ in batch]
+            results = provider.get_identities_from_auth([mapped_auth_info for _, mapped_auth_info in batch])
+            for i, identity_info in zip(indexes, results):
+                identity_infos[i] = identity_info
+        return identity_infos
+
     def _create_login_rule(self):
         """Creates the login URL rule if necessary"""
         endpoint = current_app.config['MULTIPASS_LOGIN_ENDPOINT']
@@ -484,15 +561,34 @@ class Multipass:
         try:
             return session.pop('_multipass_next_url')
         except KeyError:
-            return url_for(current_app.config['MULTIPASS_SUCCESS_ENDPOINT'])
+            return self._get_success_url()
+
+    def _get_success_url(self):
+        """Returns the URL of the ``MULTIPASS_SUCCESS_ENDPOINT``.
+
+        The URL is cached per application and URL root (scheme, host
+        and script root) unless the application uses URL defaults
+        callbacks, which may change the URL on each request.
+        """
+        endpoint = current_app.config['MULTIPASS_SUCCESS_ENDPOINT']
+        if any(current_app.url_default_functions.values()):
+            return url_for(endpoint)
+        cache = self._get_state().success_urls
+        key = (endpoint, request.url_root)
+        try:
+            return cache[key]
+        except KeyError:
+            cache[key] = url = url_for(endpoint)
+            return url
 
     def _login_selector(self):
         """Shows the login method (auth provider) selector"""
         next_url = request.args.get('next')
         auth_failed = session.pop('_multipass_auth_failed', False)
         login_endpoint = current_app.config['MULTIPASS_LOGIN_ENDPOINT']
-        if not auth_failed and self.single_auth_provider:
-            return redirect(url_for(login_endpoint, provider=self.single_auth_provider.name, next=next_url))
+        single_auth_provider = self.single_auth_provider
+        if not auth_failed and single_auth_provider is not None:
+            return redirect(url_for(login_endpoint, provider=single_auth_provider.name, next=next_url))
         else:
             return self.render_template('LOGIN_SELECTOR', providers=list(self.auth_providers.values()), next=next_url,
                                         auth_failed=auth_failed, login_endpoint=login_endpoint)
@@ -537,8 +633,14 @@ class _MultipassState:
         self.multipass = multipass
         self.app = app
         self.auth_providers = {}
+        self.single_auth_provider = None
         self.identity_providers = {}
+        self.searchable_identity_providers = ()
+        self.group_identity_providers = ()
         self.provider_map = {}
+        self.resolved_provider_map = {}
+        self.template_cache = {}
+        self.success_urls = {}
 
     def __repr__(self):
         return f'<MultipassState({self.multipass}, {self.app})>'
@@ -44,9 +44,11 @@ class AuthInfo:
                         provider. Any key that is not in `mapping` is
                         kept as-is.
         """
-        missing_keys = set(mapping.values()) - set(self.data)
-        if missing_keys:
-            raise KeyError(next(iter(missing_keys)))
+        if not mapping:
+            return AuthInfo(self.provider, **self.data)
+        for key in mapping.values():
+            if key not in self.data:
+                raise KeyError(key)
         return AuthInfo(self.provider, **convert_provider_data(self.data, mapping))
 
     def __repr__(self):
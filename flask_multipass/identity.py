@@ -69,6 +69,22 @@ class IdentityProvider(metaclass=SupportsMeta):
         """
         raise NotImplementedError
 
+    def get_identities_from_auth(self, auth_infos):
+        """Retrieves identity information for multiple auth infos
+
+        This is used when all matching identities are requested and
+        several links point to this provider.  The default
+        implementation calls :meth:`get_identity_from_auth` for each
+        of them; providers which can look up many identities at once
+        may override it to avoid one lookup per auth info.
+
+        :param auth_infos: A list of :class:`.AuthInfo` instances
+        :return: A list containing an :class:`.IdentityInfo` instance
+                 or ``None`` for each of the `auth_infos`, in the same
+                 order
+        """
+        return [self.get_identity_from_auth(auth_info) for auth_info in auth_infos]
+
     def refresh_identity(self, identifier, multipass_data):  # pragma: no cover
         """Retrieves identity information for an existing user identity
 
@@ -9,7 +9,7 @@ from ldap.controls import SimplePagedResultsControl
 
 from flask_multipass.exceptions import GroupRetrievalFailed, IdentityRetrievalFailed
 from flask_multipass.providers.ldap.globals import current_ldap
-from flask_multipass.providers.ldap.util import build_search_filter, find_one, get_page_cookie
+from flask_multipass.providers.ldap.util import build_search_filter, find_many, find_one, get_page_cookie
 
 
 def build_user_search_filter(criteria, mapping=None, exact=False):  # pragma: no cover
@@ -56,6 +56,26 @@ def get_user_by_id(uid, attributes=None):
     return find_one(current_ldap.settings['user_base'], user_filter, attributes=attributes)
 
 
+def get_users_by_ids(uids, attributes=None):
+    """Retrieves the data of several users from LDAP in one request.
+
+    No size limit is applied since an identifier may match more than
+    one entry; it is up to the caller to pick the entry it needs.
+
+    :param uids: list -- the identifiers of the users
+    :param attributes: list -- Attributes to be retrieved for the users.
+                       If ``None``, all attributes will be retrieved.
+    :raises IdentityRetrievalFailed: If any of the identifiers is falsely.
+    :return: A list of tuples containing the `dn` of a user as ``str``
+             and the found attributes in a ``dict``.
+    """
+    uids = set(uids)
+    if not uids or not all(uids):
+        raise IdentityRetrievalFailed("No identifier specified")
+    user_filter = build_user_search_filter({current_ldap.settings['uid']: uids}, exact=True)
+    return find_many(current_ldap.settings['user_base'], user_filter, attributes=attributes)
+
+
 def get_group_by_id(gid, attributes=None):
     """Retrieves a user's data from LDAP, given its identifier.
 
@@ -19,7 +19,7 @@ from flask_multipass.identity import IdentityProvider
 from flask_multipass.providers.ldap.globals import current_ldap
 from flask_multipass.providers.ldap.operations import (build_group_search_filter, build_user_search_filter,
                                                        get_group_by_id, get_token_groups_from_user_dn, get_user_by_id,
-                                                       search)
+                                                       get_users_by_ids, search)
 from flask_multipass.providers.ldap.util import ldap_context, to_unicode
 from flask_multipass.util import convert_app_data
 
@@ -184,6 +184,21 @@ class LDAPIdentityProvider(LDAPProviderMixin, IdentityProvider):
     def get_identity_from_auth(self, auth_info):  # pragma: no cover
         return self._get_identity(auth_info.data.pop('identifier'))
 
+    def get_identities_from_auth(self, auth_infos):
+        identifiers = [auth_info.data.pop('identifier') for auth_info in auth_infos]
+        with ldap_context(self.ldap_settings):
+            entries = get_users_by_ids(identifiers, self._attributes)
+        identities = {}
+        for _, user_data in entries:
+            user_data = to_unicode(user_data)
+            uids = user_data[self.ldap_settings['uid']]
+            identity = IdentityInfo(self, identifier=uids[0], **user_data)
+            # an entry may have several uids and any of them may have been used to log in;
+            # LDAP attribute matching is usually case-insensitive
+            for uid in uids:
+                identities.setdefault(uid.lower(), identity)
+        return [identities.get(identifier.lower()) for identifier in identifiers]
+
     def refresh_identity(self, identifier, multipass_data):  # pragma: no cover
         return self._get_identity(identifier)
 
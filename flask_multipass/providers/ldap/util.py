@@ -4,8 +4,11 @@
 # Flask-Multipass is free software; you can redistribute it
 # and/or modify it under the terms of the Revised BSD License.
 
+import os
+import threading
 from collections import namedtuple
 from contextlib import contextmanager
+from itertools import chain
 from urllib.parse import urlsplit
 from warnings import warn
 
@@ -24,11 +27,49 @@ from flask_multipass.util import convert_app_data
 #: A context holding the LDAP connection and the LDAP provider settings.
 LDAPContext = namedtuple('LDAPContext', ('connection', 'settings'))
 
-conn_keys = {'uri', 'bind_dn', 'bind_password', 'tls', 'starttls'}
+#: The settings identifying a connection, in a fixed order for cache keys
+conn_keys = ('bind_dn', 'bind_password', 'cert_file', 'starttls', 'uri', 'verify_cert')
+
+
+#: Idle connections, which are checked out while an application context uses them
+_connection_pool = {}
+_connection_pool_lock = threading.Lock()
+
+
+def _reset_connection_pool():
+    """Forgets all pooled connections.
+
+    This runs in forked child processes, which must not use the sockets
+    of their parent (not even to unbind them).
+    """
+    global _connection_pool_lock
+    _connection_pool.clear()
+    _connection_pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_connection_pool)
 
 
 @appcontext_tearing_down.connect
-def _clear_ldap_cache(*args, **kwargs):
+def _release_ldap_cache(*args, **kwargs):
+    # return the connections to the process-wide pool for the next app context
+    if not has_app_context():
+        return
+    connections = g.pop('_multipass_ldap_connections', None)
+    if not connections:
+        return
+    with _connection_pool_lock:
+        for cache_key, conn in connections.items():
+            _connection_pool.setdefault(cache_key, []).append(conn)
+
+
+def _clear_ldap_cache():
+    """Closes the connections used in the current application context.
+
+    These connections are checked out of the process-wide pool, so no
+    other application context is using them.
+    """
     if not has_app_context() or '_multipass_ldap_connections' not in g:
         return
     for conn in g._multipass_ldap_connections.values():
@@ -40,6 +81,37 @@ def _clear_ldap_cache(*args, **kwargs):
     del g._multipass_ldap_connections
 
 
+def _get_connection_cache_key(settings):
+    """Returns the key identifying a cached connection for the settings"""
+    return tuple((k, settings[k]) for k in conn_keys if k in settings)
+
+
+def _get_pooled_connection(cache_key):
+    """Checks out a working connection from the process-wide pool
+
+    The connection is removed from the pool, so it is used exclusively
+    by the caller until it is returned when the application context is
+    torn down.
+
+    :param cache_key: The key from :func:`_get_connection_cache_key`
+    :return: The ldap connection or ``None`` if there is no usable
+             connection in the pool.
+    """
+    while True:
+        with _connection_pool_lock:
+            idle = _connection_pool.get(cache_key)
+            if not idle:
+                return None
+            conn = idle.pop()
+        try:
+            # cheap round trip to make sure the server did not drop the connection while it was idle;
+            # if it did, the ReconnectLDAPObject transparently reconnects and binds again.
+            conn.whoami_s()
+        except ldap.LDAPError:
+            continue
+        return conn
+
+
 def _get_ldap_cache():
     """Returns the cache dictionary for ldap contexts"""
     if not has_app_context():
@@ -116,6 +188,10 @@ def ldap_connect(settings, use_cache=True):
 
     This function re-uses an existing LDAP connection if there is one
     available in the application context, unless caching is disabled.
+    When an application context is torn down, its connections go to a
+    process-wide pool so later application contexts can reuse them
+    after checking that they still work.  A pooled connection is only
+    used by one application context at a time.
 
     :param settings: dict -- The settings for a LDAP provider.
     :param use_cache: bool -- If the connection should be cached.
@@ -124,10 +200,15 @@ def ldap_connect(settings, use_cache=True):
 
     if use_cache:
         cache = _get_ldap_cache()
-        cache_key = frozenset((k, hash(v)) for k, v in settings.items() if k in conn_keys)
+        cache_key = _get_connection_cache_key(settings)
         conn = cache.get(cache_key)
         if conn is not None:
             return conn
+        if has_app_context():
+            conn = _get_pooled_connection(cache_key)
+            if conn is not None:
+                cache[cache_key] = conn
+                return conn
 
     uri_info = urlsplit(settings['uri'])
     use_ldaps = uri_info.scheme == 'ldaps'
@@ -169,10 +250,57 @@ def find_one(base_dn, search_filter, attributes=None):
     :return: A tuple containing the `dn` of the entry as ``str`` and the
              found attributes in a ``dict``.
     """
-    entry = current_ldap.connection.search_ext_s(base_dn, ldap.SCOPE_SUBTREE,
-                                                 attrlist=attributes, filterstr=search_filter,
-                                                 timeout=current_ldap.settings['timeout'], sizelimit=1)
-    return next(((dn, data) for dn, data in entry if dn), (None, None))
+    connection, settings = current_ldap
+    try:
+        return _find_first(connection, base_dn, search_filter, attributes, settings['timeout'])
+    except connection._reconnect_exceptions:
+        # unlike the synchronous methods, the asynchronous ones do not reconnect transparently
+        connection.reconnect(connection._uri, retry_max=connection._retry_max, retry_delay=connection._retry_delay)
+        return _find_first(connection, base_dn, search_filter, attributes, settings['timeout'])
+
+
+def _find_first(connection, base_dn, search_filter, attributes, timeout):
+    msg_id = connection.search_ext(base_dn, ldap.SCOPE_SUBTREE, attrlist=attributes, filterstr=search_filter,
+                                   timeout=timeout, sizelimit=1)
+    try:
+        while True:
+            # retrieve the results one by one so we can stop as soon as we have an entry
+            r_type, r_data, _, __ = connection.result3(msg_id, all=0, timeout=timeout)
+            if r_type == ldap.RES_SEARCH_RESULT:
+                break
+            entry = next(((dn, data) for dn, data in r_data if dn), None)
+            if entry is not None:
+                connection.abandon(msg_id)
+                return entry
+    except ldap.SIZELIMIT_EXCEEDED:
+        # the server only sends the final result when more than one entry matches,
+        # and if we got here none of the returned entries were valid
+        pass
+    return None, None
+
+
+def find_many(base_dn, search_filter, attributes=None, sizelimit=0):
+    """Looks for multiple entries in the LDAP server in a single request.
+
+    Unlike :func:`.operations.search` this does not use paging, so it
+    should only be used with filters matching a small, known number
+    of entries.
+
+    :param base_dn: str -- The base DN from which to start the search.
+    :param search_filter: str -- Representation of the filter to locate
+                          the entries.
+    :param attributes: list -- Attributes to be retrieved for the
+                       entries. If ``None``, all attributes will be
+                       retrieved.
+    :param sizelimit: int -- The maximum number of entries to retrieve
+                      or ``0`` for no limit.
+    :return: A list of tuples containing the `dn` of an entry as ``str``
+             and the found attributes in a ``dict``.
+    """
+    entries = current_ldap.connection.search_ext_s(base_dn, ldap.SCOPE_SUBTREE,
+                                                   attrlist=attributes, filterstr=search_filter,
+                                                   timeout=current_ldap.settings['timeout'], sizelimit=sizelimit)
+    return [(dn, data) for dn, data in entries if dn]
 
 
 def _build_assert_template(value, exact):
@@ -208,13 +336,16 @@ def build_search_filter(criteria, type_filter, mapping=None, exact=False):
     :return: str -- Valid LDAP search filter.
     """
 
+    if not criteria:
+        return None
     assertions = convert_app_data(criteria, mapping or {})
-    assert_templates = [_build_assert_template(value, exact) for _, value in assertions.items()]
-    assertions = [(k, v) for k, values in assertions.items() if k and values for v in values]
-    if not assertions:
+    assertion_values = list(chain.from_iterable((k, v) for k, values in assertions.items() if k and values
+                                                for v in values))
+    if not assertion_values:
         return None
-    filter_template = '(&{}{})'.format("".join(assert_templates), type_filter)
-    return _filter_format(filter_template, (item for assertion in assertions for item in assertion))
+    assert_templates = ''.join([_build_assert_template(value, exact) for value in assertions.values()])
+    filter_template = f'(&{assert_templates}{type_filter})'
+    return _filter_format(filter_template, assertion_values)
 
 
 def get_page_cookie(server_ctrls):
@@ -225,19 +356,21 @@ def get_page_cookie(server_ctrls):
     :raises LDAPServerError: If the server doesn't support paging of
                              search results.
     """
-    page_ctrls = [ctrl for ctrl in server_ctrls if ctrl.controlType == SimplePagedResultsControl.controlType]
-    if not page_ctrls:
+    page_ctrl = next((ctrl for ctrl in server_ctrls if ctrl.controlType == SimplePagedResultsControl.controlType),
+                     None)
+    if page_ctrl is None:
         raise LDAPServerError("The LDAP server ignores the RFC 2696 specification")
-    return page_ctrls[0].cookie
+    return page_ctrl.cookie
 
 
 def to_unicode(data):
     if isinstance(data, bytes):
         return data.decode('utf-8', 'replace')
     elif isinstance(data, dict):
-        return {to_unicode(k): to_unicode(v) for k, v in data.items()}
+        return {k if isinstance(k, str) else to_unicode(k): to_unicode(v) for k, v in data.items()}
     elif isinstance(data, list):
-        return [to_unicode(x) for x in data]
+        # LDAP entries contain lists of bytes, so decode those without recursing
+        return [x.decode('utf-8', 'replace') if isinstance(x, bytes) else to_unicode(x) for x in data]
     elif isinstance(data, set):
         return {to_unicode(x) for x in data}
     elif isinstance(data, tuple):
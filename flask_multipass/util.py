@@ -4,9 +4,9 @@
 # Flask-Multipass is free software; you can redistribute it
 # and/or modify it under the terms of the Revised BSD License.
 
-from functools import wraps
-from importlib.metadata import entry_points as importlib_entry_points
-from inspect import getmro, isclass
+import threading
+from functools import lru_cache, wraps
+from operator import attrgetter
 
 from flask import current_app
 
@@ -26,7 +26,8 @@ def convert_app_data(app_data, mapping, key_filter=None):
              filtered out by `key_filter`.
     """
     if key_filter:
-        key_filter = set(key_filter)
+        if not isinstance(key_filter, (set, frozenset)):
+            key_filter = frozenset(key_filter)
         app_data = {k: v for k, v in app_data.items() if k in key_filter}
     return {mapping.get(key, key): value for key, value in app_data.items()}
 
@@ -53,13 +54,23 @@ def convert_provider_data(provider_data, mapping, key_filter=None):
              keys of the application as defined in the `mapping` and
              filtered out by `key_filter`.
     """
-    provider_keys = set(mapping.values())
-    result = {key: value for key, value in provider_data.items() if key not in provider_keys}
-    result.update((app_key, provider_data.get(provider_key)) for app_key, provider_key in mapping.items())
-    if key_filter is not None:
-        key_filter = set(key_filter)
-        result = {key: value for key, value in result.items() if key in key_filter}
-        result.update({key: None for key in key_filter - set(result)})
+    if not mapping:
+        if key_filter is None:
+            return dict(provider_data)
+        return {key: provider_data.get(key) for key in key_filter}
+    provider_keys = frozenset(mapping.values())
+    if key_filter is None:
+        result = {key: value for key, value in provider_data.items() if key not in provider_keys}
+        for app_key, provider_key in mapping.items():
+            result[app_key] = provider_data.get(provider_key)
+        return result
+    if not isinstance(key_filter, (set, frozenset)):
+        key_filter = frozenset(key_filter)
+    result = {key: value for key, value in provider_data.items() if key in key_filter and key not in provider_keys}
+    for app_key, provider_key in mapping.items():
+        if app_key in key_filter:
+            result[app_key] = provider_data.get(provider_key)
+    result.update(dict.fromkeys(key_filter - result.keys()))
     return result
 
 
@@ -67,10 +78,14 @@ def get_canonical_provider_map(provider_map):
     """Converts the configured provider map to a canonical form"""
     canonical = {}
     for auth_provider_name, identity_providers in provider_map.items():
-        if not isinstance(identity_providers, (list, tuple, set)):
+        if isinstance(identity_providers, tuple) and all(isinstance(p, dict) for p in identity_providers):
+            # already in canonical form
+            canonical[auth_provider_name] = identity_providers
+            continue
+        elif not isinstance(identity_providers, (list, tuple, set)):
             identity_providers = [identity_providers]
-        identity_providers = tuple({'identity_provider': p} if isinstance(p, str) else p for p in identity_providers)
-        canonical[auth_provider_name] = identity_providers
+        canonical[auth_provider_name] = tuple([{'identity_provider': p} if isinstance(p, str) else p
+                                               for p in identity_providers])
     return canonical
 
 
@@ -82,10 +97,11 @@ def get_state(app=None):
     """
     if app is None:
         app = current_app
-    assert 'multipass' in app.extensions, \
+    state = app.extensions.get('multipass')
+    assert state is not None, \
         'The multipass extension was not registered to the current application. ' \
         'Please make sure to call init_app() first.'
-    return app.extensions['multipass']
+    return state
 
 
 def get_provider_base(cls):
@@ -123,6 +139,54 @@ def login_view(func):
     return decorator
 
 
+_entry_point_cache = {}
+_entry_point_cache_lock = threading.Lock()
+
+
+def _scan_entry_points(group):
+    """Returns the installed entry points of a group grouped by name"""
+    # imported lazily since scanning the installed distributions is only
+    # needed when a provider type is not registered explicitly
+    from importlib.metadata import entry_points
+    try:
+        group_entry_points = entry_points(group=group)
+    except TypeError:
+        # TODO: remove this after dropping python 3.9
+        group_entry_points = entry_points().get(group, ())
+    registry = {}
+    for ep in group_entry_points:
+        registry.setdefault(ep.name, []).append(ep)
+    return registry
+
+
+def _get_entry_points(group):
+    """Returns a dict mapping names to the entry points of a group
+
+    The installed entry points are scanned only once per group; use
+    :func:`_reset_entry_point_cache` to pick up newly installed ones.
+    """
+    try:
+        return _entry_point_cache[group]
+    except KeyError:
+        pass
+    with _entry_point_cache_lock:
+        if group not in _entry_point_cache:
+            _entry_point_cache[group] = _scan_entry_points(group)
+        return _entry_point_cache[group]
+
+
+def _reset_entry_point_cache():
+    """Discards the cached entry points and provider types loaded from them"""
+    with _entry_point_cache_lock:
+        _entry_point_cache.clear()
+    _load_entry_point_type.cache_clear()
+
+
+def _find_entry_points(group, name):
+    """Returns a list of the entry points with a given name in a group"""
+    return list(_get_entry_points(group).get(name, ()))
+
+
 def resolve_provider_type(base, type_, registry=None):
     """Resolves a provider type to its class
 
@@ -135,28 +199,43 @@ def resolve_provider_type(base, type_, registry=None):
                      over an entrypoint-based one with the same name.
     :return: The type's class, which is a subclass of `base`.
     """
-    if isclass(type_):
-        if not issubclass(type_, base):
-            raise TypeError(f'Received a class {type_} which is not a subclass of {base}')
-        return type_
+    try:
+        if issubclass(type_, base):
+            return type_
+    except TypeError:
+        # not a class, so it is the name of a provider type
+        pass
+    else:
+        raise TypeError(f'Received a class {type_} which is not a subclass of {base}')
 
     if registry is not None and type_ in registry:
         cls = registry[type_]
     else:
-        entry_points = importlib_entry_points(group=base._entry_point, name=type_)
-        if not entry_points:
-            raise ValueError('Unknown type: ' + type_)
-        elif len(entry_points) != 1:
-            # TODO: remove the getattr check after dropping python 3.8
-            defs = ', '.join(getattr(ep, 'module', ep.value) for ep in entry_points)
-            raise RuntimeError(f'Type {type_} is not unique. Defined in {defs}')
-        entry_point = entry_points[0]
-        cls = entry_point.load()
+        cls = _load_entry_point_type(base._entry_point, type_)
     if not issubclass(cls, base):
         raise TypeError(f'Found a class {cls} which is not a subclass of {base}')
     return cls
 
 
+@lru_cache(maxsize=None)
+def _load_entry_point_type(group, type_):
+    """Loads the class of a provider type from its entry point.
+
+    The installed entry points do not change while the process is
+    running, so the result is cached to avoid scanning them again.
+    """
+    entry_points = _find_entry_points(group, type_)
+    if not entry_points:
+        raise ValueError('Unknown type: ' + type_)
+    elif len(entry_points) != 1:
+        defs = ', '.join(ep.value for ep in entry_points)
+        raise RuntimeError(f'Type {type_} is not unique. Defined in {defs}')
+    return entry_points[0].load()
+
+
+resolve_provider_type.cache_clear = _load_entry_point_type.cache_clear
+
+
 def validate_provider_map(state):
     """Validates the provider map
 
@@ -165,25 +244,32 @@ def validate_provider_map(state):
     invalid_keys = state.auth_providers.keys() - state.provider_map.keys()
     if invalid_keys:
         raise ValueError('Auth providers not linked to identity providers: ' + ', '.join(invalid_keys))
-    targeted_providers = {p['identity_provider'] for providers in state.provider_map.values() for p in providers}
-    invalid_keys = targeted_providers - state.identity_providers.keys()
+    identity_providers = state.identity_providers
+    invalid_keys = {p['identity_provider'] for providers in state.provider_map.values() for p in providers
+                    if p['identity_provider'] not in identity_providers}
     if invalid_keys:
         raise ValueError('Broken identity provider links: ' + ', '.join(invalid_keys))
 
 
-class classproperty(property):
+class classproperty:
     """Like a :class:`property`, but for a class
 
     Usage::
 
         class Foo:
             @classproperty
-            @classmethod
             def foo(cls):
                 return 'bar'
+
+    Wrapping the function in a :func:`classmethod` is supported, too.
     """
+    __slots__ = ('fget',)
+
+    def __init__(self, fget):
+        self.fget = getattr(fget, '__func__', fget)
+
     def __get__(self, obj, type=None):
-        return self.fget.__get__(None, type)()
+        return self.fget(type)
 
 
 class SupportsMeta(type):
@@ -201,25 +287,53 @@ class SupportsMeta(type):
     """
     def __new__(mcs, name, bases, dct):
         cls = type.__new__(mcs, name, bases, dct)
-        base = next((x for x in reversed(getmro(cls)) if type(x) is mcs and x is not cls), None)
-        if base is None:
+        # the outermost class using this metaclass is stored on every
+        # class so subclasses do not need to scan their whole MRO for it.
+        # with several of them, use the one that comes last in the MRO.
+        roots = {b.__supports_base__ for b in bases if type(getattr(b, '__supports_base__', None)) is mcs}
+        if not roots:
+            base = cls.__supports_base__ = cls
             return cls
-        for attr, methods in base.__support_attrs__.items():
+        base = cls.__supports_base__ = roots.pop() if len(roots) == 1 else max(roots, key=cls.__mro__.index)
+        mcs._get_support_check(base)(cls, name)
+        return cls
+
+    @staticmethod
+    def _get_support_check(base):
+        """Returns a function checking a subclass of a base class
+
+        The `__support_attrs__` of the base are normalized once and the
+        returned function only runs the checks for a new subclass.  It
+        is cached on the base class and only rebuilt if its
+        `__support_attrs__` are replaced.
+        """
+        support_attrs = base.__support_attrs__
+        cached = base.__dict__.get('__support_check__')
+        if cached is not None and cached[0] is support_attrs:
+            return cached[1]
+        table = []
+        for attr, methods in support_attrs.items():
             if isinstance(methods, str):
                 methods = (methods,)
             if isinstance(attr, tuple):
-                supported = attr[0](cls)
-                message = attr[1]
+                is_supported, message = attr
             else:
-                supported = getattr(cls, attr, getattr(base, attr))
-                message = f'{attr} is True'
-            for method in methods:
-                is_overridden = (getattr(base, method) != getattr(cls, method))
-                if not supported and is_overridden:
-                    raise TypeError(f'{name} cannot override {method} unless {message}')
-                elif supported and not is_overridden:
-                    raise TypeError(f'{name} must override {method} if {message}')
-        return cls
+                is_supported, message = attrgetter(attr), f'{attr} is True'
+            table.append((is_supported, message, tuple((method, getattr(base, method)) for method in methods)))
+        table = tuple(table)
+
+        def check(cls, name):
+            for is_supported, message, methods in table:
+                supported = is_supported(cls)
+                for method, base_method in methods:
+                    is_overridden = (base_method != getattr(cls, method))
+                    if not supported and is_overridden:
+                        raise TypeError(f'{name} cannot override {method} unless {message}')
+                    elif supported and not is_overridden:
+                        raise TypeError(f'{name} must override {method} if {message}')
+
+        base.__support_check__ = (support_attrs, check)
+        return check
 
     @staticmethod
     def callable(func, message):
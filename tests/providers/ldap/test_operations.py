@@ -11,7 +11,7 @@ from ldap import NO_SUCH_OBJECT, SCOPE_BASE
 
 from flask_multipass.exceptions import GroupRetrievalFailed, IdentityRetrievalFailed
 from flask_multipass.providers.ldap.operations import (get_group_by_id, get_token_groups_from_user_dn, get_user_by_id,
-                                                       search)
+                                                       get_users_by_ids, search)
 from flask_multipass.providers.ldap.util import ldap_context
 
 
@@ -21,6 +21,32 @@ def test_get_user_by_id_handles_none_id():
     assert str(excinfo.value) == 'No identifier specified'
 
 
+@pytest.mark.parametrize('uids', ([], [None], ['alaindi', '']))
+def test_get_users_by_ids_handles_none_id(uids):
+    with pytest.raises(IdentityRetrievalFailed) as excinfo:
+        get_users_by_ids(uids)
+    assert str(excinfo.value) == 'No identifier specified'
+
+
+def test_get_users_by_ids(mocker):
+    settings = {'uri': 'ldaps://ldap.example.com:636',
+                'bind_dn': 'uid=admin,DC=example,DC=com',
+                'bind_password': 'LemotdepassedeLDAP',
+                'verify_cert': True,
+                'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+                'starttls': True,
+                'timeout': 10,
+                'uid': 'uid',
+                'user_base': 'dc=example,dc=com',
+                'user_filter': '(objectCategory=person)'}
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject')
+    find_many = mocker.patch('flask_multipass.providers.ldap.operations.find_many', return_value=[])
+    with ldap_context(settings):
+        assert get_users_by_ids(['jdoe', 'jdoe']) == []
+    # no size limit, an identifier may match several entries
+    find_many.assert_called_once_with('dc=example,dc=com', '(&(uid=jdoe)(objectCategory=person))', attributes=None)
+
+
 def test_get_group_by_id_handles_none_id():
     with pytest.raises(GroupRetrievalFailed) as excinfo:
         get_group_by_id(None)
@@ -10,7 +10,7 @@ import pytest
 from flask import Flask
 from ldap import INVALID_CREDENTIALS
 
-from flask_multipass import Multipass
+from flask_multipass import AuthInfo, Multipass
 from flask_multipass.exceptions import IdentityRetrievalFailed, InvalidCredentials, NoSuchUser
 from flask_multipass.providers.ldap import LDAPAuthProvider, LDAPGroup, LDAPIdentityProvider
 
@@ -456,6 +456,58 @@ def test_has_member_unknown_user(mocker, settings):
     assert not group.has_member('unknown_user')
 
 
+def test_get_identities_from_auth(mocker):
+    settings = {'ldap': {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'starttls': True,
+        'timeout': 10,
+        'uid': 'uid',
+        'user_base': 'dc=example,dc=com'}}
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject')
+    get_users_by_ids = mocker.patch('flask_multipass.providers.ldap.providers.get_users_by_ids',
+                                    return_value=[('uid=alaindi,dc=example,dc=com', {'uid': [b'alaindi']})])
+    app = Flask('test')
+    multipass = Multipass(app)
+    with app.app_context():
+        idp = LDAPIdentityProvider(multipass, 'LDAP test idp', settings)
+        auth_provider = MagicMock(settings={})
+        auth_infos = [AuthInfo(auth_provider, identifier='AlainDi'), AuthInfo(auth_provider, identifier='unknown')]
+        identities = idp.get_identities_from_auth(auth_infos)
+    assert get_users_by_ids.call_count == 1
+    assert get_users_by_ids.call_args[0][0] == ['AlainDi', 'unknown']
+    assert identities[0].identifier == 'alaindi'
+    assert identities[1] is None
+
+
+def test_get_identities_from_auth_multiple_uids(mocker):
+    settings = {'ldap': {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'starttls': True,
+        'timeout': 10,
+        'uid': 'uid',
+        'user_base': 'dc=example,dc=com'}}
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject')
+    mocker.patch('flask_multipass.providers.ldap.providers.get_users_by_ids',
+                 return_value=[('uid=jdoe,dc=example,dc=com', {'uid': [b'jdoe', b'john.doe']}),
+                               ('uid=jdoe2,dc=example,dc=com', {'uid': [b'jdoe2', b'john.doe']})])
+    app = Flask('test')
+    multipass = Multipass(app)
+    with app.app_context():
+        idp = LDAPIdentityProvider(multipass, 'LDAP test idp', settings)
+        auth_provider = MagicMock(settings={})
+        auth_infos = [AuthInfo(auth_provider, identifier='john.doe'), AuthInfo(auth_provider, identifier='jdoe2')]
+        identities = idp.get_identities_from_auth(auth_infos)
+    # like with a single lookup, the first matching entry is used
+    assert identities[0].identifier == 'jdoe'
+    assert identities[1].identifier == 'jdoe2'
+
+
 @pytest.mark.parametrize(('required_settings', 'expected_settings'), (
     ({'uri': 'ldaps://required.uri',
       'bind_dn': 'uid=admin,OU=Users,OU=Required,DC=example,DC=com',
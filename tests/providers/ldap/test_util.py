@@ -10,10 +10,15 @@ from urllib.parse import urlsplit
 
 import ldap
 import pytest
+from flask import Flask
+from ldap.controls import SimplePagedResultsControl
 
 from flask_multipass.exceptions import MultipassException
+from flask_multipass.providers.ldap.exceptions import LDAPServerError
 from flask_multipass.providers.ldap.globals import current_ldap
-from flask_multipass.providers.ldap.util import LDAPContext, build_search_filter, find_one, ldap_context, to_unicode
+from flask_multipass.providers.ldap.util import (LDAPContext, _connection_pool, _get_connection_cache_key,
+                                                 _reset_connection_pool, build_search_filter, find_many, find_one,
+                                                 get_page_cookie, ldap_connect, ldap_context, to_unicode)
 from flask_multipass.util import convert_app_data
 
 
@@ -63,7 +68,9 @@ def test_build_search_filter(monkeypatch, criteria, type_filter, mapping, exact,
     ({'uid': [b'amazzing'], 'givenName': [b'Antonio'], 'sn': [b'Mazzinghy']},
      {'uid': [u'amazzing'], 'givenName': [u'Antonio'], 'sn': [u'Mazzinghy']}),
     ({'uid': ['poisson'], 'company': [b'Chez Ordralfab\xc3\xa9tix'], 'sn': [b'I\xc3\xa9losubmarine']},
-     {'uid': [u'poisson'], 'company': [u'Chez Ordralfab\xe9tix'], 'sn': [u'I\xe9losubmarine']})
+     {'uid': [u'poisson'], 'company': [u'Chez Ordralfab\xe9tix'], 'sn': [u'I\xe9losubmarine']}),
+    ({b'uid': [b'poisson'], 'ldap': {'uri': b'ldap://example.com', 'groups': [(b'a', {b'b'})], 'timeout': 10}},
+     {'uid': ['poisson'], 'ldap': {'uri': 'ldap://example.com', 'groups': [('a', {'b'})], 'timeout': 10}}),
 ))
 def test_to_unicode(data, expected):
     assert to_unicode(data) == expected
@@ -158,6 +165,161 @@ def test_ldap_context(mocker, settings, options):
     assert not current_ldap, 'The LDAP context has not been unset'
 
 
+def test_get_connection_cache_key():
+    settings = {'uri': 'ldaps://ldap.example.com:636', 'bind_dn': 'uid=admin,DC=example,DC=com',
+                'bind_password': 'LemotdepassedeLDAP', 'starttls': False, 'timeout': 10, 'verify_cert': True,
+                'cert_file': '/etc/ssl/certs/ca-certificates.crt'}
+    reordered = dict(reversed(list(settings.items())), timeout=30)
+    assert _get_connection_cache_key(settings) == _get_connection_cache_key(reordered) == (
+        ('bind_dn', 'uid=admin,DC=example,DC=com'), ('bind_password', 'LemotdepassedeLDAP'),
+        ('cert_file', '/etc/ssl/certs/ca-certificates.crt'), ('starttls', False),
+        ('uri', 'ldaps://ldap.example.com:636'), ('verify_cert', True))
+
+
+@pytest.fixture
+def connection_pool():
+    _reset_connection_pool()
+    yield _connection_pool
+    _reset_connection_pool()
+
+
+def test_ldap_connect_cached(mocker, connection_pool):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': False,
+        'timeout': 10
+    }
+    ldap_initialize = mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject',
+                                   side_effect=lambda *args, **kwargs: MagicMock())
+    with Flask('test').app_context():
+        conn = ldap_connect(settings)
+        assert ldap_connect(dict(settings, timeout=30)) is conn
+        assert ldap_connect(dict(settings, bind_password='other')) is not conn
+        assert ldap_connect(settings, use_cache=False) is not conn
+    assert ldap_initialize.call_count == 3
+
+
+def test_ldap_connect_pooled(mocker, connection_pool):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': False,
+        'timeout': 10
+    }
+    ldap_initialize = mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject',
+                                   side_effect=lambda *args, **kwargs: MagicMock())
+    app = Flask('test')
+    with app.app_context():
+        conn = ldap_connect(settings)
+        assert not conn.whoami_s.called
+        assert not connection_pool
+    # the connection survives the app context and is checked before being reused
+    assert not conn.unbind_s.called
+    assert connection_pool == {_get_connection_cache_key(settings): [conn]}
+    with app.app_context():
+        assert ldap_connect(settings) is conn
+        assert ldap_connect(settings) is conn
+        # checked out while in use
+        assert not any(connection_pool.values())
+    assert conn.whoami_s.call_count == 1
+    assert ldap_initialize.call_count == 1
+    # a broken connection is replaced
+    conn.whoami_s.side_effect = ldap.SERVER_DOWN
+    with app.app_context():
+        new_conn = ldap_connect(settings)
+    assert new_conn is not conn
+    assert list(connection_pool.values()) == [[new_conn]]
+    # no pooling outside an app context
+    assert ldap_connect(settings) is not new_conn
+
+
+@pytest.mark.parametrize('tls_settings', (
+    {'verify_cert': False},
+    {'cert_file': '/etc/ssl/certs/other.crt'},
+    {'starttls': True},
+))
+def test_ldap_connect_pooled_tls_settings(mocker, connection_pool, tls_settings):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': False,
+        'timeout': 10
+    }
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject',
+                 side_effect=lambda *args, **kwargs: MagicMock())
+    mocker.patch('flask_multipass.providers.ldap.util.warn')
+    app = Flask('test')
+    with app.app_context():
+        conn = ldap_connect(settings)
+    # a connection is never reused with different TLS settings
+    with app.app_context():
+        assert ldap_connect(dict(settings, **tls_settings)) is not conn
+    with app.app_context():
+        assert ldap_connect(settings) is conn
+
+
+def test_ldap_context_error_clears_pool(mocker, connection_pool):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': False,
+        'timeout': 10
+    }
+    ldap_conn = MagicMock()
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject', return_value=ldap_conn)
+    with Flask('test').app_context():
+        with pytest.raises(MultipassException):
+            with ldap_context(settings):
+                raise ldap.SERVER_DOWN
+    assert not any(connection_pool.values())
+    ldap_conn.unbind_s.assert_called_once_with()
+
+
+def test_ldap_context_error_other_app_context(mocker, connection_pool):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': False,
+        'timeout': 10
+    }
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject',
+                 side_effect=lambda *args, **kwargs: MagicMock())
+    app = Flask('test')
+    with app.app_context():
+        conn = ldap_connect(settings)
+    with app.app_context():
+        with ldap_context(settings) as ldap_ctx:
+            assert ldap_ctx.connection is conn
+            # a concurrent app context does not share the checked out connection
+            with app.app_context():
+                with pytest.raises(ValueError):
+                    with ldap_context(settings) as other_ldap_ctx:
+                        other_conn = other_ldap_ctx.connection
+                        assert other_conn is not conn
+                        raise ldap.FILTER_ERROR
+                other_conn.unbind_s.assert_called_once_with()
+            assert not conn.unbind_s.called
+            ldap_ctx.connection.search_s('dc=example,dc=com')
+    assert not conn.unbind_s.called
+    assert connection_pool == {_get_connection_cache_key(settings): [conn]}
+
+
 @pytest.mark.parametrize(('method', 'triggered_exception', 'caught_exception', 'message'), (
     ('search_s', ldap.SERVER_DOWN, MultipassException, 'The LDAP server is unreachable'),
     ('simple_bind_s', ldap.INVALID_CREDENTIALS, ValueError, 'Invalid bind credentials'),
@@ -214,9 +376,117 @@ def test_find_one(mocker, base_dn, search_filter, data, expected):
         'timeout': 10
     }
 
+    results = [(ldap.RES_SEARCH_ENTRY, [entry], 'msg_id', []) for entry in data]
+    results.append((ldap.RES_SEARCH_RESULT, [], 'msg_id', []))
+    ldap_conn = MagicMock(search_ext=MagicMock(return_value='msg_id'), result3=MagicMock(side_effect=results))
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject', return_value=ldap_conn)
+
+    with ldap_context(settings):
+        assert find_one(base_dn, search_filter) == expected
+    if expected[0]:
+        ldap_conn.abandon.assert_called_once_with('msg_id')
+    else:
+        assert not ldap_conn.abandon.called
+        assert ldap_conn.result3.call_count == len(results)
+
+
+def test_find_one_sizelimit_exceeded(mocker):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': True,
+        'timeout': 10
+    }
+    results = [(ldap.RES_SEARCH_ENTRY, [(None, {'cn': ['Configuration']})], 'msg_id', []), ldap.SIZELIMIT_EXCEEDED]
+    ldap_conn = MagicMock(search_ext=MagicMock(return_value='msg_id'), result3=MagicMock(side_effect=results))
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject', return_value=ldap_conn)
+
+    with ldap_context(settings):
+        assert find_one('dc=example,dc=com', '(mail=alain.dissoir@mail.com)') == (None, None)
+
+
+_reconnect_attrs = {
+    '_reconnect_exceptions': (ldap.SERVER_DOWN, ldap.UNAVAILABLE, ldap.CONNECT_ERROR, ldap.TIMEOUT),
+    '_retry_max': 3,
+    '_retry_delay': 5.0,
+}
+
+
+@pytest.mark.parametrize('fail_method', ('search_ext', 'result3'))
+@pytest.mark.parametrize('exception', (ldap.SERVER_DOWN, ldap.UNAVAILABLE, ldap.CONNECT_ERROR, ldap.TIMEOUT))
+def test_find_one_reconnect(mocker, fail_method, exception):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': True,
+        'timeout': 10
+    }
+    entry = ('cn=alaindi,OU=Users,dc=example,dc=com', {'mail': ['alain.dissoir@mail.com']})
+    ldap_conn = MagicMock(search_ext=MagicMock(return_value='msg_id'),
+                          result3=MagicMock(return_value=(ldap.RES_SEARCH_ENTRY, [entry], 'msg_id', [])),
+                          _uri=settings['uri'], **_reconnect_attrs)
+    failing = getattr(ldap_conn, fail_method)
+    failing.side_effect = [exception, failing.return_value]
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject', return_value=ldap_conn)
+
+    with ldap_context(settings):
+        assert find_one('dc=example,dc=com', '(mail=alain.dissoir@mail.com)') == entry
+    ldap_conn.reconnect.assert_called_once_with(settings['uri'], retry_max=3, retry_delay=5.0)
+    assert ldap_conn.search_ext.call_count == 2
+
+
+def test_find_one_reconnect_failed(mocker):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': True,
+        'timeout': 10
+    }
+    ldap_conn = MagicMock(search_ext=MagicMock(side_effect=ldap.SERVER_DOWN), _uri=settings['uri'],
+                          **_reconnect_attrs)
+    mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject', return_value=ldap_conn)
+
+    with pytest.raises(MultipassException, match='unreachable'):
+        with ldap_context(settings):
+            find_one('dc=example,dc=com', '(mail=alain.dissoir@mail.com)')
+    ldap_conn.reconnect.assert_called_once_with(settings['uri'], retry_max=3, retry_delay=5.0)
+
+
+def test_find_many(mocker):
+    settings = {
+        'uri': 'ldaps://ldap.example.com:636',
+        'bind_dn': 'uid=admin,DC=example,DC=com',
+        'bind_password': 'LemotdepassedeLDAP',
+        'verify_cert': True,
+        'cert_file': '/etc/ssl/certs/ca-certificates.crt',
+        'starttls': True,
+        'timeout': 10
+    }
+    data = [(None, {'cn': ['Configuration']}),
+            ('cn=alaindi,OU=Users,dc=example,dc=com', {'mail': ['alain.dissoir@mail.com']}),
+            ('cn=alainb,OU=Users,dc=example,dc=com', {'mail': ['alain.bolo@mail.com']})]
+
     ldap_search = MagicMock(return_value=data)
     ldap_conn = MagicMock(search_ext_s=ldap_search)
     mocker.patch('flask_multipass.providers.ldap.util.ReconnectLDAPObject', return_value=ldap_conn)
 
     with ldap_context(settings):
-        assert find_one(base_dn, search_filter) == expected
+        assert find_many('dc=example,dc=com', '(|(cn=alaindi)(cn=alainb))', sizelimit=2) == data[1:]
+    assert ldap_search.call_args[1]['sizelimit'] == 2
+
+
+def test_get_page_cookie():
+    other_ctrl = MagicMock(controlType='1.2.3.4')
+    page_ctrl = SimplePagedResultsControl(True, size=10, cookie='cookie')
+    assert get_page_cookie([other_ctrl, page_ctrl]) == 'cookie'
+    with pytest.raises(LDAPServerError):
+        get_page_cookie([other_ctrl])
@@ -5,11 +5,15 @@
 # and/or modify it under the terms of the Revised BSD License.
 
 from unittest.mock import Mock
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 from flask import Flask, request, session
+from jinja2 import DictLoader
 
-from flask_multipass import AuthenticationFailed, AuthProvider, Multipass
+import flask_multipass.core
+from flask_multipass import AuthenticationFailed, AuthInfo, AuthProvider, IdentityRetrievalFailed, Multipass
+from flask_multipass.providers.static import StaticAuthProvider, StaticIdentityProvider
 
 
 def test_init_app_twice():
@@ -65,6 +69,8 @@ def test_initialize_providers():
         auth_providers = multipass._create_providers('AUTH', AuthProvider)
         assert auth_providers['test'].settings == {'foo': 'bar'}
         assert auth_providers['test2'].settings == {'hello': 'world'}
+    # the configured settings are not modified
+    assert app.config['MULTIPASS_AUTH_PROVIDERS']['test'] == {'type': 'foo', 'foo': 'bar'}
 
 
 def test_initialize_providers_unique():
@@ -106,12 +112,36 @@ def test_render_template(mocker):
     app = Flask('test')
     app.config['MULTIPASS_FOO_TEMPLATE'] = None
     app.config['MULTIPASS_BAR_TEMPLATE'] = 'bar.html'
+    app.jinja_loader = DictLoader({'bar.html': '{{ foo }}'})
     multipass = Multipass(app)
     with app.app_context():
         with pytest.raises(RuntimeError):
             multipass.render_template('FOO', foo='bar')
         multipass.render_template('BAR', foo='bar')
-        render_template.assert_called_with('bar.html', foo='bar')
+        render_template.assert_called_with(app.jinja_env.get_template('bar.html'), foo='bar')
+
+
+def test_render_template_cached():
+    app = Flask('test')
+    app.config['MULTIPASS_BAR_TEMPLATE'] = 'bar.html'
+    app.jinja_loader = DictLoader({'bar.html': '{{ foo }}'})
+    multipass = Multipass(app)
+    with app.app_context():
+        assert multipass.render_template('BAR', foo='bar') == 'bar'
+        template = app.extensions['multipass'].template_cache['bar.html']
+        assert multipass.render_template('BAR', foo='baz') == 'baz'
+        assert app.extensions['multipass'].template_cache['bar.html'] is template
+
+
+def test_render_template_auto_reload():
+    app = Flask('test')
+    app.config['TEMPLATES_AUTO_RELOAD'] = True
+    app.config['MULTIPASS_BAR_TEMPLATE'] = 'bar.html'
+    app.jinja_loader = DictLoader({'bar.html': '{{ foo }}'})
+    multipass = Multipass(app)
+    with app.app_context():
+        assert multipass.render_template('BAR', foo='bar') == 'bar'
+        assert not app.extensions['multipass'].template_cache
 
 
 def test_next_url():
@@ -218,3 +248,223 @@ def test_handle_auth_error_with_redirect(mocker):
         multipass.handle_auth_error(AuthenticationFailed(), redirect_to_login=True)
         assert flash.called
         redirect.assert_called_with(app.config['MULTIPASS_LOGIN_URLS'][0])
+
+
+def _make_static_app(all_matching=False, require_identity=True):
+    app = Flask('test')
+    app.config['SECRET_KEY'] = 'testing'
+    app.config['MULTIPASS_ALL_MATCHING_IDENTITIES'] = all_matching
+    app.config['MULTIPASS_REQUIRE_IDENTITY'] = require_identity
+    app.config['MULTIPASS_AUTH_PROVIDERS'] = {'test': {'type': StaticAuthProvider}}
+    app.config['MULTIPASS_IDENTITY_PROVIDERS'] = {
+        'first': {'type': StaticIdentityProvider, 'identities': {'alice': {'email': 'alice@first'}}},
+        'second': {'type': StaticIdentityProvider, 'identities': {'alice': {'email': 'alice@second'}}},
+    }
+    app.config['MULTIPASS_PROVIDER_MAP'] = {'test': [{'identity_provider': 'first', 'mapping': {'username': 'login'}},
+                                                     'second']}
+    return app
+
+
+def test_resolved_provider_map():
+    app = _make_static_app()
+    Multipass(app)
+    state = app.extensions['multipass']
+    assert state.resolved_provider_map == {
+        'test': ((state.identity_providers['first'], {'username': 'login'}),
+                 (state.identity_providers['second'], {}))
+    }
+
+
+@pytest.mark.parametrize(('all_matching', 'expected'), (
+    (False, 'alice@first'),
+    (True, ['alice@first', 'alice@second']),
+))
+def test_handle_auth_success(all_matching, expected):
+    app = _make_static_app(all_matching=all_matching)
+    multipass = Multipass(app)
+    callback = Mock(return_value='response')
+    multipass.identity_handler(callback)
+    with app.test_request_context():
+        auth_provider = multipass.auth_providers['test']
+        assert multipass.handle_auth_success(AuthInfo(auth_provider, login='alice', username='alice')) == 'response'
+        identity_info = callback.call_args[0][0]
+        if all_matching:
+            assert [x.data['email'] for x in identity_info] == expected
+        else:
+            assert identity_info.data['email'] == expected
+        assert session['_multipass_login_provider'] == 'test'
+
+
+def test_handle_auth_success_no_identity():
+    app = _make_static_app()
+    multipass = Multipass(app)
+    multipass.identity_handler(Mock())
+    with app.test_request_context():
+        auth_provider = multipass.auth_providers['test']
+        with pytest.raises(IdentityRetrievalFailed):
+            multipass.handle_auth_success(AuthInfo(auth_provider, login='bob', username='bob'))
+
+
+def test_search_identities():
+    app = _make_static_app()
+    app.config['MULTIPASS_IDENTITY_PROVIDERS']['third'] = {'type': StaticIdentityProvider, 'search_enabled': False,
+                                                           'identities': {'alice': {'email': 'alice@third'}}}
+    multipass = Multipass(app)
+    with app.app_context():
+        state = app.extensions['multipass']
+        assert {p.name for p in state.searchable_identity_providers} == {'first', 'second'}
+        found = {x.data['email'] for x in multipass.search_identities(email='alice')}
+        assert found == {'alice@first', 'alice@second'}
+        found = {x.data['email'] for x in multipass.search_identities(providers=['second', 'third'], email='alice')}
+        assert found == {'alice@second'}
+        identities, total = multipass.search_identities_ex(providers=['first'], criteria={'email': 'alice'})
+        assert [x.data['email'] for x in identities] == ['alice@first']
+        assert total == 1
+
+
+def test_search_groups():
+    app = _make_static_app()
+    app.config['MULTIPASS_IDENTITY_PROVIDERS']['first']['groups'] = {'admins': ['alice']}
+    app.config['MULTIPASS_IDENTITY_PROVIDERS']['second']['groups'] = {'admins': []}
+    multipass = Multipass(app)
+    with app.app_context():
+        assert {g.provider.name for g in multipass.search_groups('adm')} == {'first', 'second'}
+        assert [g.provider.name for g in multipass.search_groups('admins', providers={'second'}, exact=True)] == \
+            ['second']
+
+
+def test_handle_auth_success_batched(mocker):
+    app = _make_static_app(all_matching=True)
+    app.config['MULTIPASS_IDENTITY_PROVIDERS']['first']['identities']['bob'] = {'email': 'bob@first'}
+    app.config['MULTIPASS_PROVIDER_MAP'] = {'test': [{'identity_provider': 'first', 'mapping': {'username': 'login'}},
+                                                     'second',
+                                                     {'identity_provider': 'first', 'mapping': {'username': 'other'}}]}
+    multipass = Multipass(app)
+    callback = Mock()
+    multipass.identity_handler(callback)
+    get_identities_from_auth = mocker.spy(StaticIdentityProvider, 'get_identities_from_auth')
+    with app.test_request_context():
+        auth_provider = multipass.auth_providers['test']
+        multipass.handle_auth_success(AuthInfo(auth_provider, login='alice', username='alice', other='bob'))
+    assert [x.data['email'] for x in callback.call_args[0][0]] == ['alice@first', 'alice@second', 'bob@first']
+    # one call per identity provider, not per link
+    assert get_identities_from_auth.call_count == 2
+
+
+def test_state_multiple_apps():
+    apps = Flask('test'), Flask('test')
+    multipass = Multipass()
+    for i, app in enumerate(apps):
+        app.config['MULTIPASS_AUTH_PROVIDERS'] = {f'test{i}': {'type': FooProvider}}
+        app.config['MULTIPASS_PROVIDER_MAP'] = {f'test{i}': []}
+        multipass.init_app(app)
+    for i, app in enumerate(apps):
+        with app.app_context():
+            assert multipass._get_state() is app.extensions['multipass']
+            assert set(multipass.auth_providers) == {f'test{i}'}
+
+
+@pytest.mark.parametrize('all_matching', (False, True))
+def test_handle_auth_success_not_required(all_matching):
+    app = _make_static_app(all_matching=all_matching, require_identity=False)
+    multipass = Multipass(app)
+    callback = Mock(return_value='response')
+    multipass.identity_handler(callback)
+    with app.test_request_context():
+        auth_provider = multipass.auth_providers['test']
+        multipass.handle_auth_success(AuthInfo(auth_provider, login='bob', username='bob'))
+    callback.assert_called_once_with([] if all_matching else None)
+
+
+def test_handle_auth_success_secure_login():
+    app = _make_static_app()
+    multipass = Multipass(app)
+    callback = Mock()
+    multipass.identity_handler(callback)
+    with app.test_request_context():
+        auth_provider = multipass.auth_providers['test']
+        multipass.handle_auth_success(AuthInfo(auth_provider, secure_login=True, login='alice', username='alice'))
+    assert callback.call_args[0][0].secure_login
+
+
+def test_single_auth_provider():
+    app = _make_static_app()
+    multipass = Multipass(app)
+    with app.app_context():
+        assert multipass.single_auth_provider is multipass.auth_providers['test']
+    app = _make_static_app()
+    app.config['MULTIPASS_AUTH_PROVIDERS']['other'] = {'type': StaticAuthProvider}
+    app.config['MULTIPASS_PROVIDER_MAP']['other'] = 'first'
+    multipass = Multipass(app)
+    with app.app_context():
+        assert multipass.single_auth_provider is None
+
+
+def test_login_selector_single_provider():
+    app = _make_static_app()
+    app.add_url_rule('/', 'index')
+    Multipass(app)
+    with app.test_client() as c:
+        response = c.get('/login/?next=/foo')
+        assert response.status_code == 302
+        location = urlsplit(response.location)
+        assert location.path == '/login/test'
+        assert parse_qs(location.query) == {'next': ['/foo']}
+
+
+def test_success_url_cached(mocker):
+    app = Flask('test')
+    app.add_url_rule('/success', 'success')
+    app.config['MULTIPASS_SUCCESS_ENDPOINT'] = 'success'
+    multipass = Multipass(app)
+    url_for = mocker.spy(flask_multipass.core, 'url_for')
+    with app.test_request_context():
+        assert multipass._get_success_url() == '/success'
+        assert multipass._get_success_url() == '/success'
+    with app.test_request_context(base_url='http://localhost/app'):
+        assert multipass._get_success_url() == '/app/success'
+    assert url_for.call_count == 2
+
+
+def test_success_url_host_matching():
+    app = Flask('test', host_matching=True, static_host='a.com')
+    app.add_url_rule('/success', 'success', host='a.com')
+    app.config['MULTIPASS_SUCCESS_ENDPOINT'] = 'success'
+    multipass = Multipass(app)
+    with app.test_request_context(base_url='http://a.com'):
+        assert multipass._get_success_url() == '/success'
+    with app.test_request_context(base_url='https://b.com'):
+        assert multipass._get_success_url() == 'https://a.com/success'
+
+
+def test_success_url_defaults(mocker):
+    app = Flask('test')
+    app.add_url_rule('/success/<lang>', 'success')
+    app.config['MULTIPASS_SUCCESS_ENDPOINT'] = 'success'
+
+    @app.url_defaults
+    def _add_lang(endpoint, values):
+        values.setdefault('lang', request.args.get('lang', 'en'))
+
+    multipass = Multipass(app)
+    with app.test_request_context():
+        assert multipass._get_success_url() == '/success/en'
+    with app.test_request_context('/?lang=fr'):
+        assert multipass._get_success_url() == '/success/fr'
+
+
+def test_init_app_no_auth_providers(mocker):
+    validate_provider_map = mocker.patch('flask_multipass.core.validate_provider_map')
+    app = Flask('test')
+    app.config['MULTIPASS_IDENTITY_PROVIDERS'] = {'test': {'type': StaticIdentityProvider}}
+    Multipass(app)
+    state = app.extensions['multipass']
+    assert state.provider_map == state.resolved_provider_map == {}
+    assert not validate_provider_map.called
+
+
+def test_init_app_unlinked_auth_provider():
+    app = Flask('test')
+    app.config['MULTIPASS_AUTH_PROVIDERS'] = {'test': {'type': StaticAuthProvider}}
+    with pytest.raises(ValueError):
+        Multipass(app)
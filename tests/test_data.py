@@ -33,12 +33,14 @@ def test_authinfo_map(dummy_auth_provider, mapping, output_data):
     ai2 = ai.map(mapping)
     assert ai2.data == output_data
     assert ai.data == original_data
+    assert ai2.data is not ai.data
 
 
 def test_authinfo_map_invalid(dummy_auth_provider):
     ai = AuthInfo(dummy_auth_provider, foo='bar')
-    with pytest.raises(KeyError):
-        ai.map({'foo': 'nop'})
+    with pytest.raises(KeyError) as excinfo:
+        ai.map({'foo': 'nop', 'bar': 'foo'})
+    assert excinfo.value.args == ('nop',)
 
 
 def test_identityinfo_identifier_string():
@@ -4,6 +4,8 @@
 # Flask-Multipass is free software; you can redistribute it
 # and/or modify it under the terms of the Revised BSD License.
 
+from unittest.mock import Mock
+
 import pytest
 from flask import Flask
 
@@ -44,3 +46,13 @@ def test_map_search_criteria(criteria, mapping, result):
         settings = {'mapping': mapping}
         provider = IdentityProvider(None, 'foo', settings)
         assert provider.map_search_criteria(criteria) == result
+
+
+def test_get_identities_from_auth():
+    app = Flask('test')
+    Multipass(app)
+    with app.app_context():
+        provider = IdentityProvider(None, 'foo', {})
+        provider.get_identity_from_auth = Mock(side_effect=lambda auth_info: None if auth_info is None else auth_info)
+        assert provider.get_identities_from_auth(['a', None, 'b']) == ['a', None, 'b']
+        assert provider.get_identity_from_auth.call_count == 3
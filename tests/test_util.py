@@ -5,10 +5,12 @@
 # and/or modify it under the terms of the Revised BSD License.
 
 from importlib.metadata import EntryPoint
+from unittest.mock import MagicMock
 
 import pytest
 from flask import Flask
 
+import flask_multipass.util
 from flask_multipass import Multipass
 from flask_multipass.auth import AuthProvider
 from flask_multipass.core import _MultipassState
@@ -34,6 +36,11 @@ def test_get_canonical_provider_map(config_map, canonical_map):
     assert get_canonical_provider_map(config_map) == canonical_map
 
 
+def test_get_canonical_provider_map_already_canonical():
+    links = ({'identity_provider': 'bar'}, {'identity_provider': 'moo', 'mapping': {'a': 'b'}})
+    assert get_canonical_provider_map({'foo': links})['foo'] is links
+
+
 def test_get_state_app_not_initialized():
     app = Flask('test')
     with pytest.raises(AssertionError):
@@ -71,11 +78,13 @@ def test_get_state():
     ({'pk1': 'a', 'pk2': 'b'}, {'ak1': 'pk1'},               None,           {'ak1': 'a', 'pk2': 'b'}),
     ({'pk1': 'a', 'pk2': 'b'}, {'ak1': 'pk1', 'ak2': 'pk3'}, None,           {'ak1': 'a', 'ak2': None, 'pk2': 'b'}),
     ({'pk1': 'a'},             {},                           [],             {}),
+    ({'pk1': 'a', 'pk2': 'b'}, {},                           ['pk1', 'pk3'], {'pk1': 'a', 'pk3': None}),
     ({'pk1': 'a', 'pk2': 'b'}, {'ak1': 'pk1'},               ['ak1', 'ak1'], {'ak1': 'a'}),
     ({'pk1': 'a', 'pk2': 'b'}, {'ak1': 'pk1', 'ak2': 'pk3'}, {'ak1'},        {'ak1': 'a'}),
     ({'pk1': 'a', 'pk2': 'b'}, {'ak1': 'pk1', 'ak2': 'pk3'}, {'ak1', 'pk2'}, {'ak1': 'a', 'pk2': 'b'}),
     ({'pk1': 'a', 'pk2': 'b'}, {'ak1': 'pk1', 'ak2': 'pk3'}, {'ak1', 'ak2'}, {'ak1': 'a', 'ak2': None}),
     ({'pk1': 'a', 'pk2': 'b'}, {'ak1': 'pk1'},               {'ak1', 'ak2'}, {'ak1': 'a', 'ak2': None}),
+    ({'pk1': 'a', 'ak1': 'b'}, {'ak1': 'pk1'},               {'ak1', 'pk1'}, {'ak1': 'a', 'pk1': None}),
 ))
 def test_convert_provider_data(provider_data, mapping, key_filter, result):
     assert convert_provider_data(provider_data, mapping, key_filter) == result
@@ -198,7 +207,7 @@ def mock_entry_point(name):
 
 @pytest.fixture
 def mock_entry_points(monkeypatch):
-    def _mock_entry_points(*, group, name):
+    def _mock_entry_points(group, name):
         return {
             'dummy': [mock_entry_point('dummy')],
             'fake': [mock_entry_point('fake')],
@@ -206,7 +215,10 @@ def mock_entry_points(monkeypatch):
             'unknown': []
         }[name]
 
-    monkeypatch.setattr('flask_multipass.util.importlib_entry_points', _mock_entry_points)
+    monkeypatch.setattr('flask_multipass.util._find_entry_points', _mock_entry_points)
+    resolve_provider_type.cache_clear()
+    yield
+    resolve_provider_type.cache_clear()
 
 
 def test_resolve_provider_type_class():
@@ -233,6 +245,37 @@ def test_resolve_provider_type():
     assert resolve_provider_type(DummyBase, 'dummy') is Dummy
 
 
+def test_resolve_provider_type_entry_point():
+    from flask_multipass.providers.static import StaticAuthProvider
+    assert resolve_provider_type(AuthProvider, 'static') is StaticAuthProvider
+
+
+def test_entry_point_cache(monkeypatch):
+    scan = MagicMock(return_value={'dummy': [mock_entry_point('dummy')]})
+    monkeypatch.setattr('flask_multipass.util._scan_entry_points', scan)
+    flask_multipass.util._reset_entry_point_cache()
+    try:
+        assert resolve_provider_type(DummyBase, 'dummy') is Dummy
+        assert scan.call_count == 1
+        resolve_provider_type.cache_clear()
+        assert resolve_provider_type(DummyBase, 'dummy') is Dummy
+        assert scan.call_count == 1
+        flask_multipass.util._reset_entry_point_cache()
+        assert resolve_provider_type(DummyBase, 'dummy') is Dummy
+        assert scan.call_count == 2
+    finally:
+        flask_multipass.util._reset_entry_point_cache()
+
+
+def test_resolve_provider_type_cached(mock_entry_points, monkeypatch):
+    assert resolve_provider_type(DummyBase, 'dummy') is Dummy
+    monkeypatch.setattr('flask_multipass.util._find_entry_points', lambda group, name: [])
+    assert resolve_provider_type(DummyBase, 'dummy') is Dummy
+    resolve_provider_type.cache_clear()
+    with pytest.raises(ValueError):
+        resolve_provider_type(DummyBase, 'dummy')
+
+
 @pytest.mark.parametrize(('valid', 'auth_providers', 'identity_providers', 'provider_map'), (
     (False, ['a'], [],    {}),
     (False, ['a'], ['a'], {}),
@@ -283,6 +326,20 @@ def test_classproperty():
     assert Foo.bar == 'asdf'
 
 
+def test_classproperty_plain_function():
+    class Foo:
+        @classproperty
+        def bar(cls):
+            return cls.__name__
+
+    class B(Foo):
+        pass
+
+    assert Foo.bar == 'Foo'
+    assert B.bar == 'B'
+    assert B().bar == 'B'
+
+
 def test_supports_meta_no_support_attrs():
     class BrokenBase(metaclass=SupportsMeta):
         pass
@@ -372,6 +429,76 @@ def test_supports_meta_multi():
                 pass
 
 
+def test_supports_meta_base():
+    class Base(metaclass=SupportsMeta):
+        __support_attrs__ = {}
+
+    class Mixin:
+        pass
+
+    class Test(Mixin, Base):
+        pass
+
+    class Test2(Test):
+        pass
+
+    assert Base.__supports_base__ is Base
+    assert Test.__supports_base__ is Base
+    assert Test2.__supports_base__ is Base
+
+
+def test_supports_meta_multiple_bases():
+    class A(metaclass=SupportsMeta):
+        __support_attrs__ = {'has_a': 'a'}
+        has_a = False
+
+        def a(self):
+            pass
+
+    class B(metaclass=SupportsMeta):
+        __support_attrs__ = {'has_b': 'b'}
+        has_b = False
+
+        def b(self):
+            pass
+
+    class Mixin(A):
+        pass
+
+    # like the MRO scan, the checks use the outermost base
+    with pytest.raises(TypeError, match='C must override b if has_b is True'):
+        class C(A, B):
+            has_b = True
+
+    class D(Mixin, B):
+        pass
+
+    assert D.__supports_base__ is B
+
+    class E(D):
+        pass
+
+    assert E.__supports_base__ is B
+
+
+def test_supports_meta_support_attrs_replaced():
+    class Base(metaclass=SupportsMeta):
+        __support_attrs__ = {'has_foo': 'foo'}
+        has_foo = True
+
+        def foo(self):
+            pass
+
+    with pytest.raises(TypeError):
+        class Test(Base):
+            pass
+
+    Base.__support_attrs__ = {}
+
+    class Test(Base):
+        pass
+
+
 def test_supports_meta_default_true():
     class Base(metaclass=SupportsMeta):
         __support_attrs__ = {'has_foo': 'foo'}